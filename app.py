@@ -5,6 +5,7 @@ import datetime
 from io import BytesIO
 from datetime import time
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 
 # Try importing plotly for visualizations, gracefully handle if not available
 try:
@@ -15,6 +16,13 @@ except ImportError:
     plotly_available = False
     st.warning("⚠️ Plotly not installed. Visual charts will be disabled. To enable charts, run: pip install plotly")
 
+# Use the Rust-based calamine Excel reader when available (pandas 2.2+), otherwise pandas' default engine
+try:
+    import python_calamine  # noqa: F401
+    excel_engine = "calamine" if tuple(int(v) for v in pd.__version__.split(".")[:2]) >= (2, 2) else None
+except ImportError:
+    excel_engine = None
+
 # ================== CONFIG ==================
 st.set_page_config(
     page_title="Staff Attendance Dashboard",
@@ -23,6 +31,7 @@ st.set_page_config(
 
 # Configuration
 LATE_TIME = time(8, 0)  # 8:00 AM
+LATE_MINUTES = LATE_TIME.hour * 60 + LATE_TIME.minute  # Late threshold as minutes since midnight
 WORK_DAYS_PER_WEEK = 5  # Assuming Monday-Friday work week
 WORK_DAYS_PER_MONTH = 22  # Average work days per month
 
@@ -158,76 +167,108 @@ def count_weekdays(start_date, end_date):
     """Count number of weekdays (Monday-Friday) between two dates inclusive"""
     if start_date > end_date:
         return 0
-    all_dates = pd.date_range(start=start_date, end=end_date, freq='D')
-    weekdays = sum(1 for date in all_dates if date.weekday() < 5)  # Monday=0, Sunday=6
-    return weekdays
+    # busday_count excludes the end date, so extend the range by one day
+    return int(np.busday_count(start_date, end_date + datetime.timedelta(days=1)))
+
+def convert_time_column(values):
+    """Convert a column of time cells to minutes since midnight (NaN where missing or unparseable)"""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.dt.hour * 60 + values.dt.minute
+    
+    minutes = pd.Series(np.nan, index=values.index)
+    cell_types = values.map(type)
+    
+    # Handle string time
+    is_text = cell_types == str
+    if is_text.any():
+        parsed = pd.to_datetime(values[is_text].str.strip(), format="%H:%M", errors="coerce")
+        minutes[is_text] = parsed.dt.hour * 60 + parsed.dt.minute
+    
+    # Handle Excel time format
+    is_time = cell_types == datetime.time
+    if is_time.any():
+        minutes[is_time] = pd.to_timedelta(values[is_time].astype(str)) // pd.Timedelta(minutes=1)
+    
+    is_datetime = cell_types.isin([datetime.datetime, pd.Timestamp])
+    if is_datetime.any():
+        parsed = pd.to_datetime(values[is_datetime])
+        minutes[is_datetime] = parsed.dt.hour * 60 + parsed.dt.minute
+    
+    return minutes
+
+@st.cache_data(show_spinner=False)
+def convert_df_to_csv(df):
+    """Serialize a DataFrame for download, cached so reruns don't re-encode unchanged reports"""
+    return df.to_csv(index=False)
 
 # ================== DATA PROCESSING FUNCTIONS ==================
-def process_excel_file(file, file_name=""):
-    """Process a single uploaded Excel file with the specific format"""
+@st.cache_data(show_spinner=False)
+def process_excel_file(file_bytes, file_name=""):
+    """Process a single uploaded Excel file with the specific format, returning (data, error message)"""
     try:
-        # Read Excel file, skip the first row (title row)
-        df = pd.read_excel(file, header=1)
-        
-        # Clean column names
-        df.columns = ["person_id", "name", "department", "date", "sign_in", "sign_out"]
+        # Read Excel file, skip the first row (title row); calamine parses far faster than openpyxl.
+        # Clean column names and declare the text column types up front instead of inferring them
+        df = pd.read_excel(
+            BytesIO(file_bytes),
+            header=1,
+            engine=excel_engine,
+            usecols="A:F",
+            names=["person_id", "name", "department", "date", "sign_in", "sign_out"],
+            dtype={"person_id": "string", "name": "string", "department": "string"}
+        )
         
-        # Convert date column to datetime
+        # Convert date column to datetime (cells mix Excel dates and MM/DD/YYYY text, which parse_dates would leave unparsed)
         df["date"] = pd.to_datetime(df["date"], errors="coerce")
         
-        # Convert time columns to datetime.time
-        def convert_time(x):
-            if pd.isna(x):
-                return None
-            try:
-                # Handle Excel time format
-                if isinstance(x, (datetime.time, datetime.datetime)):
-                    return x.time() if isinstance(x, datetime.datetime) else x
-                # Handle string time
-                if isinstance(x, str) and x.strip() != '-':
-                    return datetime.datetime.strptime(x.strip(), "%H:%M").time()
-                return None
-            except:
-                return None
-        
-        df["sign_in_time"] = df["sign_in"].apply(convert_time)
-        df["sign_out_time"] = df["sign_out"].apply(convert_time)
-        
-        # Filter out rows where sign_in_time is null
-        df = df[df["sign_in_time"].notna()].copy()
+        # Convert time columns to minutes since midnight, so time checks are vectorized integer comparisons
+        df["sign_in_minutes"] = convert_time_column(df["sign_in"])
+        df["sign_out_minutes"] = convert_time_column(df["sign_out"])
+        
+        # Filter out rows without a sign-in time, dropping the raw cell values in the same selection
+        # so neither an intermediate frame nor a defensive copy is made
+        df = df.loc[df["sign_in_minutes"].notna(), df.columns.drop(["sign_in", "sign_out"])].astype(
+            # Minutes of the day fit in 16 bits; sign-outs may be missing
+            {"sign_in_minutes": "int16", "sign_out_minutes": "Int16"}
+        )
         
         if df.empty:
-            return df
+            return df, None
         
-        # Add day of week
-        df["day"] = df["date"].dt.day_name()
-        df["weekday"] = df["date"].dt.weekday  # Monday=0, Sunday=6
+        # Derived columns are collected here and attached in one concat instead of one insert each
+        derived = {}
+        
+        # Add day of week (day names are kept for the data model; the charts read weekday)
+        weekday = df["date"].dt.weekday  # Monday=0, Sunday=6
+        derived["day"] = df["date"].dt.day_name()
+        derived["weekday"] = weekday
         
         # Flag for weekdays (Monday-Friday)
-        df["is_weekday"] = df["weekday"] < 5
+        derived["is_weekday"] = weekday < 5
         
-        # Add week number and week identifier
-        df["week_num"] = df["date"].dt.isocalendar().week
-        df["week_year"] = df["date"].dt.isocalendar().year
-        df["week_identifier"] = df["week_year"].astype(str) + "-W" + df["week_num"].astype(str).str.zfill(2)
+        # Add week number and week identifier from a single ISO calendar computation
+        iso = df["date"].dt.isocalendar()
+        week_num = iso["week"].astype("UInt8")  # Small nullable integers (dates may be missing)
+        week_year = iso["year"].astype("UInt16")
+        derived["week_num"] = week_num
+        derived["week_year"] = week_year
+        derived["week_key"] = week_year.astype("UInt32") * 100 + week_num  # e.g. 202409; sorts chronologically
         
         # Add month and year for time period tracking
-        df["month"] = df["date"].dt.month
-        df["year"] = df["date"].dt.year
-        df["month_year"] = df["date"].dt.strftime("%b %Y")
+        month = df["date"].dt.month.astype("Int8")
+        year = df["date"].dt.year.astype("Int16")
+        derived["month"] = month
+        derived["year"] = year
+        derived["month_key"] = year.astype("Int32") * 100 + month  # e.g. 202403; sorts chronologically
         
-        # Mark late arrivals (after 8:00 AM)
-        df["late"] = df["sign_in_time"].apply(lambda x: x > LATE_TIME if x else False)
-        df["on_time"] = ~df["late"]
+        # Mark late arrivals (after 8:00 AM); every other sign-in is on time, so no separate on_time column is stored
+        derived["late"] = df["sign_in_minutes"] > LATE_MINUTES
         
-        # Add source file name for tracking
-        df["source_file"] = file_name
+        df = pd.concat([df, pd.DataFrame(derived, index=df.index)], axis=1)
         
-        return df
+        return df, None
     
     except Exception as e:
-        st.error(f"Error processing file {file_name}: {str(e)}")
-        return pd.DataFrame()
+        return pd.DataFrame(), f"Error processing file {file_name}: {str(e)}"
 
 def process_staff_list(file):
     """Process the staff master list file"""
@@ -269,23 +310,42 @@ def process_staff_list(file):
         st.error(f"Error processing staff list: {str(e)}")
         return pd.DataFrame()
 
-def combine_all_files(uploaded_files):
-    """Combine data from all uploaded files"""
+@st.cache_data(show_spinner=False)
+def combine_all_files(files):
+    """Combine data from all uploaded files, given as a tuple of (file name, file bytes) pairs"""
     all_data = []
-    file_names = []
+    file_names = [file_name for file_name, _ in files]
+    source_files = []
+    errors = []
     
-    for uploaded_file in uploaded_files:
-        file_name = uploaded_file.name
-        file_names.append(file_name)
-        df = process_excel_file(uploaded_file, file_name)
+    # Parse the files concurrently; results come back in upload order
+    with ThreadPoolExecutor(max_workers=max(1, min(8, len(files)))) as executor:
+        results = list(executor.map(process_excel_file, [file_bytes for _, file_bytes in files], file_names))
+    
+    for file_name, (df, error) in zip(file_names, results):
+        if error:
+            errors.append(error)
         if not df.empty:
             all_data.append(df)
+            source_files.append(file_name)
     
     if all_data:
         combined_df = pd.concat(all_data, ignore_index=True)
-        return combined_df, file_names
+        
+        # Add source file name for tracking, as codes repeated per file rather than one string per row
+        file_codes, file_categories = pd.factorize(pd.Index(source_files))
+        combined_df["source_file"] = pd.Categorical.from_codes(
+            np.repeat(file_codes, [len(data) for data in all_data]),
+            categories=file_categories
+        )
+        
+        # Repeated string keys as categoricals so groupbys hash integer codes
+        for col in ["name", "department", "day"]:
+            combined_df[col] = combined_df[col].astype("category")
+        
+        return combined_df, file_names, errors
     else:
-        return pd.DataFrame(), file_names
+        return pd.DataFrame(), file_names, errors
 
 def calculate_absenteeism(df, staff_list_df=None, avg_daily_wage=100):
     """Calculate days lost due to absenteeism considering only weekdays"""
@@ -361,14 +421,33 @@ def categorize_attendance(attendance_rate):
     else:
         return "🔴 Intervention Required", "intervention"
 
-def compare_staff_lists(attendance_df, staff_list_df):
+def categorize_attendance_rates(attendance_rates):
+    """Categorize a Series of attendance rates in one vectorized pass"""
+    return pd.cut(
+        attendance_rates,
+        bins=[-np.inf, 85, 95, np.inf],
+        labels=["Intervention Required", "Needs Monitoring", "Excellent"],
+        right=False
+    )
+
+def classify_attendance_status(total_days):
+    """Classify a Series of weekday sign-in counts as Regular (3+), Occasional or Non-Attending"""
+    return pd.cut(
+        total_days,
+        bins=[-np.inf, 1, 3, np.inf],
+        labels=["Non-Attending", "Occasional", "Regular"],
+        right=False
+    )
+
+@st.cache_data(show_spinner=False)
+def compare_staff_lists(data_key, _attendance_df, _staff_list_df):
     """Compare attendance data with master staff list to identify non-attending staff"""
-    if attendance_df.empty or staff_list_df.empty:
+    if _attendance_df.empty or _staff_list_df.empty:
         return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), 0
     
-    # Clean names for comparison (uppercase and strip)
-    attendance_df['name_clean'] = attendance_df['name'].astype(str).str.strip().str.upper()
-    staff_list_df['name_clean'] = staff_list_df['name'].astype(str).str.strip().str.upper()
+    # Clean names for comparison (uppercase and strip), without mutating the caller's frames
+    attendance_df = _attendance_df.assign(name_clean=_attendance_df['name'].astype(str).str.strip().str.upper())
+    staff_list_df = _staff_list_df.assign(name_clean=_staff_list_df['name'].astype(str).str.strip().str.upper())
     
     # Find staff who have signed in on weekdays
     weekday_df = attendance_df[attendance_df['is_weekday']]
@@ -396,31 +475,17 @@ def compare_staff_lists(attendance_df, staff_list_df):
     max_date = attendance_df['date'].max().date()
     expected_days = count_weekdays(min_date, max_date)
     
-    # Merge attendance data (weekday only) with master list for analysis
-    weekday_stats = weekday_df.groupby('name_clean').agg({
-        'sign_in_time': 'count',
-        'on_time': 'sum',
-        'late': 'sum'
-    }).reset_index()
-    
-    merged_df = pd.merge(
-        staff_list_df,
-        weekday_stats,
-        on='name_clean',
-        how='left'
+    # Weekday stats per staff name, looked up for each master list row (zero for non-attending staff)
+    weekday_stats = weekday_df.groupby('name_clean', sort=False).agg(
+        total_days=('sign_in_minutes', 'count'),
+        late_days=('late', 'sum')
     )
+    weekday_stats['on_time_days'] = weekday_stats['total_days'] - weekday_stats['late_days']
+    staff_stats = weekday_stats.reindex(staff_list_df['name_clean'], fill_value=0)
     
-    # Rename columns
-    merged_df = merged_df.rename(columns={
-        'sign_in_time': 'total_days',
-        'on_time': 'on_time_days',
-        'late': 'late_days'
-    })
-    
-    # Fill NaN values for non-attending staff
-    merged_df['total_days'] = merged_df['total_days'].fillna(0).astype(int)
-    merged_df['on_time_days'] = merged_df['on_time_days'].fillna(0).astype(int)
-    merged_df['late_days'] = merged_df['late_days'].fillna(0).astype(int)
+    merged_df = staff_list_df.reset_index(drop=True)
+    for col in ['total_days', 'on_time_days', 'late_days']:
+        merged_df[col] = staff_stats[col].to_numpy().astype("int32")
     
     # Calculate attendance rate (based on weekdays)
     merged_df['attendance_rate'] = round((merged_df['total_days'] / expected_days) * 100, 1) if expected_days > 0 else 0
@@ -428,33 +493,33 @@ def compare_staff_lists(attendance_df, staff_list_df):
     # Calculate days lost per staff
     merged_df['days_lost'] = expected_days - merged_df['total_days']
     
-    # Calculate on-time percentage
-    merged_df['on_time_percentage'] = merged_df.apply(
-        lambda x: round((x['on_time_days'] / x['total_days'] * 100), 1) if x['total_days'] > 0 else 0,
-        axis=1
-    )
+    # Calculate on-time percentage (0 for staff with no weekday sign-ins)
+    merged_df['on_time_percentage'] = round(
+        (merged_df['on_time_days'] / merged_df['total_days'].replace(0, np.nan)) * 100, 1
+    ).fillna(0)
     
     # Add attendance status and category
-    merged_df['attendance_category'] = merged_df['attendance_rate'].apply(
-        lambda x: 'Excellent' if x >= 95 else ('Needs Monitoring' if x >= 85 else 'Intervention Required')
-    )
+    merged_df['attendance_category'] = categorize_attendance_rates(merged_df['attendance_rate'])
     
     # Add attendance status type
-    merged_df['attendance_status_type'] = merged_df['total_days'].apply(
-        lambda x: 'Regular' if x >= 3 else ('Occasional' if x > 0 else 'Non-Attending')
-    )
+    merged_df['attendance_status_type'] = classify_attendance_status(merged_df['total_days'])
     
     return merged_df, non_attending_staff, attendance_only_staff, expected_days
 
-def calculate_kpis(df, staff_list_df=None):
+@st.cache_data(show_spinner=False)
+def calculate_kpis(data_key, _df, _staff_list_df=None, today=None):
     """Calculate KPI metrics from the combined data considering weekdays"""
-    if df.empty:
+    # Today's date is an argument so the cached result expires when the day changes
+    if today is None:
+        today = datetime.date.today()
+    
+    if _df.empty:
         base_kpis = {
             "total_staff": 0,
             "present_today": 0,
             "absent_today": 0,
             "avg_signins": 0.0,
-            "today": datetime.date.today(),
+            "today": today,
             "total_on_time": 0,
             "total_late": 0,
             "on_time_rate": 0.0,
@@ -465,64 +530,59 @@ def calculate_kpis(df, staff_list_df=None):
             "weekend_signins": 0
         }
         
-        if staff_list_df is not None and not staff_list_df.empty:
+        if _staff_list_df is not None and not _staff_list_df.empty:
             base_kpis.update({
-                "total_staff_in_list": len(staff_list_df),
+                "total_staff_in_list": len(_staff_list_df),
                 "attending_staff": 0,
-                "non_attending_staff": len(staff_list_df),
+                "non_attending_staff": len(_staff_list_df),
                 "attendance_rate": 0.0
             })
         
         return base_kpis
     
-    # Filter to weekdays for most metrics
-    weekday_df = df[df['is_weekday']].copy()
-    
-    # Get unique staff count from attendance data (any sign-in)
-    all_attending_staff_count = df["name"].nunique()
+    # Filter to weekdays for most metrics, keeping only the columns the KPIs read
+    weekday_df = _df.loc[_df['is_weekday'], ["name", "date", "late"]]
     
     # For attendance metrics, we only consider weekdays
     attending_staff_count_weekday = weekday_df["name"].nunique()
     
-    # Get today's date
-    today = datetime.date.today()
-    
     # Filter for today's data (if today is weekday, consider sign-ins; if weekend, set present_today to 0 or handle appropriately)
     if today.weekday() < 5:  # Today is weekday
-        today_data = weekday_df[weekday_df["date"].dt.date == today]
-        present_today = today_data["name"].nunique() if not today_data.empty else 0
+        # Compare calendar days as datetime64[D] rather than building a datetime.date per row
+        today_mask = weekday_df["date"].to_numpy().astype("datetime64[D]") == np.datetime64(today)
+        present_today = weekday_df.loc[today_mask, "name"].nunique()
     else:
         present_today = 0  # No attendance expected on weekend
     
-    # Calculate average sign-ins per staff (weekdays only)
+    # Calculate average sign-ins per staff (weekdays only); each named row is a sign-in, so no per-staff groupby is needed
     if attending_staff_count_weekday > 0:
-        signins_by_staff = weekday_df.groupby("name")["sign_in_time"].count()
-        avg_signins = round(signins_by_staff.mean(), 1)
+        avg_signins = round(weekday_df["name"].count() / attending_staff_count_weekday, 1)
     else:
         avg_signins = 0.0
     
     # Calculate punctuality stats (weekdays only)
-    total_on_time = weekday_df[weekday_df["on_time"]]["name"].count()
-    total_late = weekday_df[weekday_df["late"]]["name"].count()
+    named = weekday_df["name"].notna().to_numpy()  # Rows without a staff name are not counted
+    total_late = int(np.count_nonzero(weekday_df["late"].to_numpy() & named))
+    total_on_time = int(np.count_nonzero(named)) - total_late
     total_signins_weekday = total_on_time + total_late
     on_time_rate = round((total_on_time / total_signins_weekday * 100), 1) if total_signins_weekday > 0 else 0.0
     
     # Calculate average daily attendance rate (based on weekdays)
-    unique_dates = weekday_df["date"].dt.date.nunique()
-    if unique_dates > 0 and attending_staff_count_weekday > 0:
-        daily_attendance = weekday_df.groupby("date")["name"].nunique().mean()
+    has_dates = weekday_df["date"].notna().any()
+    if has_dates and attending_staff_count_weekday > 0:
+        daily_attendance = weekday_df.groupby("date", sort=False)["name"].nunique().mean()
         avg_daily_attendance = round(daily_attendance / attending_staff_count_weekday * 100, 1)
     else:
         avg_daily_attendance = 0.0
     
     # Calculate date range (all days)
-    min_date = df["date"].min().date()
-    max_date = df["date"].max().date()
+    min_date = _df["date"].min().date()
+    max_date = _df["date"].max().date()
     date_range = f"{min_date.strftime('%b %d, %Y')} to {max_date.strftime('%b %d, %Y')}"
     total_days_covered = (max_date - min_date).days + 1
     
     # Weekend sign-ins
-    weekend_df = df[~df['is_weekday']]
+    weekend_df = _df[~_df['is_weekday']]
     weekend_signins = len(weekend_df)
     
     kpis = {
@@ -542,8 +602,8 @@ def calculate_kpis(df, staff_list_df=None):
     }
     
     # Add staff list comparison metrics if staff list is provided
-    if staff_list_df is not None and not staff_list_df.empty:
-        total_staff_in_list = len(staff_list_df)
+    if _staff_list_df is not None and not _staff_list_df.empty:
+        total_staff_in_list = len(_staff_list_df)
         non_attending_count = total_staff_in_list - attending_staff_count_weekday
         attendance_rate = round((attending_staff_count_weekday / total_staff_in_list) * 100, 1) if total_staff_in_list > 0 else 0
         
@@ -566,13 +626,14 @@ def calculate_kpis(df, staff_list_df=None):
     
     return kpis
 
-def create_attendance_leaderboard(merged_df):
+@st.cache_data(show_spinner=False)
+def create_attendance_leaderboard(data_key, _merged_df):
     """Create a leaderboard of staff ranked by attendance and punctuality (based on weekdays)"""
-    if merged_df.empty:
+    if _merged_df.empty:
         return pd.DataFrame()
     
     # Sort by total days descending, then by on-time percentage descending
-    leaderboard = merged_df.sort_values(
+    leaderboard = _merged_df.sort_values(
         by=["total_days", "on_time_percentage"], 
         ascending=[False, False]
     ).reset_index(drop=True)
@@ -592,60 +653,78 @@ def create_attendance_leaderboard(merged_df):
     
     return leaderboard[display_cols]
 
-def create_time_period_report(df, period_type="week"):
+@st.cache_data(show_spinner=False)
+def create_attendance_stats(data_key, _df):
+    """Build per-staff weekday attendance stats from attendance data alone (used when no staff list is uploaded)"""
+    weekday_df = _df[_df['is_weekday']]
+    attendance_stats = weekday_df.groupby(["name", "department"], observed=True).agg(
+        total_days=("sign_in_minutes", "count"),
+        late_days=("late", "sum")
+    ).reset_index()
+    attendance_stats.insert(3, "on_time_days", attendance_stats["total_days"] - attendance_stats["late_days"])
+    attendance_stats["on_time_percentage"] = round(
+        (attendance_stats["on_time_days"] / attendance_stats["total_days"]) * 100, 1
+    )
+    
+    # Calculate days lost (based on weekdays)
+    min_date = _df['date'].min().date()
+    max_date = _df['date'].max().date()
+    period_weekdays = count_weekdays(min_date, max_date)
+    attendance_stats["days_lost"] = period_weekdays - attendance_stats["total_days"]
+    attendance_stats["attendance_rate"] = round((attendance_stats["total_days"] / period_weekdays) * 100, 1)
+    
+    attendance_stats["attendance_category"] = categorize_attendance_rates(attendance_stats["attendance_rate"])
+    attendance_stats["attendance_status_type"] = classify_attendance_status(attendance_stats["total_days"])
+    
+    return attendance_stats
+
+@st.cache_data(show_spinner=False)
+def create_time_period_report(data_key, _df, period_type="week"):
     """Create a report grouped by time period (week or month) considering only weekdays"""
-    if df.empty:
+    if _df.empty:
         return pd.DataFrame()
     
-    # Filter to weekdays
-    weekday_df = df[df['is_weekday']].copy()
-    
     if period_type == "week":
-        # Group by week
-        period_col = "week_identifier"
+        # Group by week, using the integer year*100+week key
+        period_col = "week_key"
         period_name = "Week"
     else:
-        # Group by month
-        period_col = "month_year"
+        # Group by month, using the integer year*100+month key
+        period_col = "month_key"
         period_name = "Month"
     
-    # Calculate statistics by time period
-    period_stats = weekday_df.groupby(period_col).agg({
-        "name": "nunique",
-        "sign_in_time": "count",
-        "on_time": "sum",
-        "late": "sum"
-    }).reset_index()
+    # Filter to weekdays, keeping only the columns the report reads
+    weekday_df = _df.loc[_df['is_weekday'], [period_col, "name", "sign_in_minutes", "late"]]
     
-    period_stats.columns = [period_name, "Unique Staff", "Total Sign-Ins", "On-Time", "Late"]
+    # Calculate statistics by time period; the integer keys come out of the groupby in chronological order
+    period_stats = weekday_df.groupby(period_col).agg(**{
+        "Unique Staff": ("name", "nunique"),
+        "Total Sign-Ins": ("sign_in_minutes", "count"),
+        "Late": ("late", "sum")
+    }).rename_axis(period_name).reset_index()
+    period_stats.insert(3, "On-Time", period_stats["Total Sign-Ins"] - period_stats["Late"])
     
     # Calculate percentages
     period_stats["On-Time %"] = round((period_stats["On-Time"] / period_stats["Total Sign-Ins"]) * 100, 1)
     
     # Calculate attendance rate for the period
-    if len(weekday_df['name'].unique()) > 0:
-        total_staff = weekday_df['name'].nunique()
+    total_staff = weekday_df['name'].nunique()
+    if total_staff > 0:
         period_stats["Attendance Rate %"] = round((period_stats["Unique Staff"] / total_staff) * 100, 1)
     
-    # Sort by period
+    # Format the period keys as display labels
+    period_keys = period_stats[period_name]
     if period_type == "week":
-        # Sort weeks chronologically
-        period_stats[period_name] = pd.Categorical(
-            period_stats[period_name], 
-            categories=sorted(period_stats[period_name].unique(), key=lambda x: (int(x.split('-')[0]), int(x.split('-W')[1]))),
-            ordered=True
-        )
+        period_stats[period_name] = (period_keys // 100).astype(str) + "-W" + (period_keys % 100).astype(str).str.zfill(2)
     else:
-        # Sort months chronologically
-        period_stats["sort_date"] = pd.to_datetime(period_stats[period_name], format="%b %Y")
-        period_stats = period_stats.sort_values("sort_date")
-        period_stats = period_stats.drop("sort_date", axis=1)
-    
-    period_stats = period_stats.sort_values(period_name).reset_index(drop=True)
+        period_stats[period_name] = pd.to_datetime(
+            pd.DataFrame({"year": period_keys // 100, "month": period_keys % 100, "day": 1})
+        ).dt.strftime("%b %Y")
     
     return period_stats
 
-def create_visual_analytics(df, leaderboard):
+@st.cache_data(show_spinner=False)
+def create_visual_analytics(data_key, _df, _leaderboard):
     """Create interactive visual analytics (requires plotly)"""
     if not plotly_available:
         return None, None, None
@@ -653,22 +732,18 @@ def create_visual_analytics(df, leaderboard):
     fig1, fig2, fig3 = None, None, None
     
     # Filter to weekdays for heatmap (since that's when attendance matters)
-    weekday_df = df[df['is_weekday']].copy()
+    weekday_df = _df[_df['is_weekday']]
     
     if not weekday_df.empty:
-        # 1. Attendance Heatmap by Day/Hour
-        weekday_df['hour'] = weekday_df['sign_in_time'].apply(lambda x: x.hour)
-        heatmap_data = weekday_df.pivot_table(
-            index='day', 
-            columns='hour', 
-            values='sign_in_time', 
-            aggfunc='count',
-            fill_value=0
-        )
-        
-        # Reorder days
+        # 1. Attendance Heatmap by Day/Hour, counted with a single bincount over (weekday, hour) cells
         day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
-        heatmap_data = heatmap_data.reindex([d for d in day_order if d in heatmap_data.index])
+        # weekday is float when any row has an unparseable date, but weekday rows never hold NaN
+        cells = weekday_df['weekday'].to_numpy(dtype=np.intp) * 24 + weekday_df['sign_in_minutes'].to_numpy() // 60
+        counts = np.bincount(cells, minlength=len(day_order) * 24).reshape(len(day_order), 24)
+        
+        # Keep only the days and hours that have sign-ins
+        heatmap_data = pd.DataFrame(counts, index=day_order, columns=range(24))
+        heatmap_data = heatmap_data.loc[counts.sum(axis=1) > 0, counts.sum(axis=0) > 0]
         
         fig1 = go.Figure(data=go.Heatmap(
             z=heatmap_data.values,
@@ -685,12 +760,13 @@ def create_visual_analytics(df, leaderboard):
             height=400
         )
     
-    if not leaderboard.empty and 'attendance_status_type' in leaderboard.columns:
+    if not _leaderboard.empty and 'attendance_status_type' in _leaderboard.columns:
         # 2. Attendance Rate Distribution
         fig2 = go.Figure()
         
-        # Add bars for each attendance category
-        category_counts = leaderboard['attendance_status_type'].value_counts()
+        # Add bars for each attendance category (skipping empty categorical levels)
+        category_counts = _leaderboard['attendance_status_type'].value_counts()
+        category_counts = category_counts[category_counts > 0]
         
         colors = {'Regular': '#28a745', 'Occasional': '#ffc107', 'Non-Attending': '#dc3545'}
         
@@ -711,12 +787,12 @@ def create_visual_analytics(df, leaderboard):
         )
         
         # 3. Days Lost Distribution
-        if 'days_lost' in leaderboard.columns:
+        if 'days_lost' in _leaderboard.columns:
             fig3 = go.Figure()
             
             # Create histogram of days lost
             fig3.add_trace(go.Histogram(
-                x=leaderboard['days_lost'],
+                x=_leaderboard['days_lost'],
                 nbinsx=20,
                 marker_color='#dc3545',
                 opacity=0.7,
@@ -732,7 +808,7 @@ def create_visual_analytics(df, leaderboard):
             )
             
             # Add vertical line for average
-            avg_days_lost = leaderboard['days_lost'].mean()
+            avg_days_lost = _leaderboard['days_lost'].mean()
             fig3.add_vline(
                 x=avg_days_lost, 
                 line_dash="dash", 
@@ -746,8 +822,19 @@ def create_visual_analytics(df, leaderboard):
 # ================== MAIN ==================
 if uploaded_files:
     # Process all uploaded files
-    with st.spinner("Processing uploaded files..."):
-        df, file_names = combine_all_files(uploaded_files)
+    # Reuse the combined data across reruns while the same files stay uploaded,
+    # skipping even the cache lookup (which has to hash every file's bytes)
+    files_key = tuple(f.file_id for f in uploaded_files)
+    if st.session_state.get("attendance_files_key") != files_key:
+        with st.spinner("Processing uploaded files..."):
+            # Key the cache on raw file contents so new uploads of known files skip re-parsing
+            files = tuple((f.name, f.getvalue()) for f in uploaded_files)
+            st.session_state["attendance_data"] = combine_all_files(files)
+        st.session_state["attendance_files_key"] = files_key
+    df, file_names, file_errors = st.session_state["attendance_data"]
+    
+    for error in file_errors:
+        st.error(error)
     
     if not df.empty:
         # File upload summary
@@ -761,6 +848,13 @@ if uploaded_files:
             if not staff_list_df.empty:
                 st.success(f"✅ Processed staff list with {len(staff_list_df)} staff members")
         
+        # Key the cached reports on the uploads instead of the frames: Streamlit would hash every
+        # frame on each call, and beyond 50k rows it only hashes a sample of the rows
+        data_key = (
+            files_key,
+            staff_list_file.file_id if staff_list_file is not None else None
+        )
+        
         # Compare staff lists if staff list is provided
         merged_df = pd.DataFrame()
         non_attending_staff = pd.DataFrame()
@@ -768,10 +862,10 @@ if uploaded_files:
         expected_days = 0
         
         if not staff_list_df.empty:
-            merged_df, non_attending_staff, attendance_only_staff, expected_days = compare_staff_lists(df, staff_list_df)
+            merged_df, non_attending_staff, attendance_only_staff, expected_days = compare_staff_lists(data_key, df, staff_list_df)
         
         # Calculate KPIs
-        kpis = calculate_kpis(df, staff_list_df)
+        kpis = calculate_kpis(data_key, df, staff_list_df, datetime.date.today())
         
         # Calculate absenteeism metrics (already weekday-based)
         absenteeism = calculate_absenteeism(df, staff_list_df, avg_daily_wage)
@@ -943,7 +1037,7 @@ if uploaded_files:
                     )
                     
                     # Add download option for non-attending staff
-                    csv_data = non_attending_staff.to_csv(index=False)
+                    csv_data = convert_df_to_csv(non_attending_staff)
                     st.download_button(
                         label="📥 Download Non-Attending Staff List",
                         data=csv_data,
@@ -1022,7 +1116,7 @@ if uploaded_files:
         st.markdown("### 📈 Visual Analytics (Weekdays)")
         
         if plotly_available:
-            fig1, fig2, fig3 = create_visual_analytics(df, merged_df if not merged_df.empty else pd.DataFrame())
+            fig1, fig2, fig3 = create_visual_analytics(data_key, df, merged_df if not merged_df.empty else pd.DataFrame())
             
             col1, col2 = st.columns(2)
             
@@ -1044,36 +1138,10 @@ if uploaded_files:
         
         # Use merged_df if available, otherwise create from attendance data (weekdays only)
         if not merged_df.empty:
-            leaderboard = create_attendance_leaderboard(merged_df)
+            leaderboard = create_attendance_leaderboard(data_key, merged_df)
         else:
             # Create basic leaderboard from attendance data only (weekdays)
-            weekday_df = df[df['is_weekday']].copy()
-            attendance_stats = weekday_df.groupby(["name", "department"]).agg({
-                "sign_in_time": "count",
-                "on_time": "sum",
-                "late": "sum"
-            }).reset_index()
-            
-            attendance_stats.columns = ["name", "department", "total_days", "on_time_days", "late_days"]
-            attendance_stats["on_time_percentage"] = round(
-                (attendance_stats["on_time_days"] / attendance_stats["total_days"]) * 100, 1
-            )
-            
-            # Calculate days lost (based on weekdays)
-            min_date = df['date'].min().date()
-            max_date = df['date'].max().date()
-            period_weekdays = count_weekdays(min_date, max_date)
-            attendance_stats["days_lost"] = period_weekdays - attendance_stats["total_days"]
-            attendance_stats["attendance_rate"] = round((attendance_stats["total_days"] / period_weekdays) * 100, 1)
-            
-            attendance_stats["attendance_category"] = attendance_stats["attendance_rate"].apply(
-                lambda x: 'Excellent' if x >= 95 else ('Needs Monitoring' if x >= 85 else 'Intervention Required')
-            )
-            
-            attendance_stats["attendance_status_type"] = attendance_stats["total_days"].apply(
-                lambda x: 'Regular' if x >= 3 else ('Occasional' if x > 0 else 'Non-Attending')
-            )
-            
+            attendance_stats = create_attendance_stats(data_key, df)
             leaderboard = attendance_stats.sort_values("total_days", ascending=False).reset_index(drop=True)
             leaderboard.insert(0, "rank", range(1, len(leaderboard) + 1))
         
@@ -1118,11 +1186,12 @@ if uploaded_files:
             
             with col1:
                 if len(leaderboard) > 0:
-                    top_performer = leaderboard.iloc[0]
+                    # Read the two scalars directly rather than materializing the whole top row
+                    top_name = leaderboard.at[0, "name"]
                     st.metric(
                         "Top Performer", 
-                        top_performer["name"].split()[0] if isinstance(top_performer["name"], str) else "N/A",
-                        delta=f"{top_performer['total_days']} weekdays",
+                        top_name.split()[0] if isinstance(top_name, str) else "N/A",
+                        delta=f"{leaderboard.at[0, 'total_days']} weekdays",
                         help="Staff with most weekdays attended"
                     )
             
@@ -1136,7 +1205,7 @@ if uploaded_files:
             
             with col3:
                 if "attendance_status_type" in leaderboard.columns:
-                    regular_count = len(leaderboard[leaderboard["attendance_status_type"] == "Regular"])
+                    regular_count = int((leaderboard["attendance_status_type"] == "Regular").sum())
                     st.metric(
                         "Regular Attendees", 
                         regular_count,
@@ -1159,7 +1228,7 @@ if uploaded_files:
         
         with tab1:
             st.markdown("#### 📊 Weekly Attendance Trends")
-            weekly_report = create_time_period_report(df, period_type="week")
+            weekly_report = create_time_period_report(data_key, df, period_type="week")
             
             if not weekly_report.empty:
                 st.dataframe(
@@ -1191,7 +1260,7 @@ if uploaded_files:
         
         with tab2:
             st.markdown("#### 📊 Monthly Attendance Trends")
-            monthly_report = create_time_period_report(df, period_type="month")
+            monthly_report = create_time_period_report(data_key, df, period_type="month")
             
             if not monthly_report.empty:
                 st.dataframe(
@@ -1232,7 +1301,7 @@ if uploaded_files:
         with col1:
             # Export full comparison report
             if not merged_df.empty:
-                csv_data = merged_df.to_csv(index=False)
+                csv_data = convert_df_to_csv(merged_df)
                 st.download_button(
                     label="📊 Download Full Report",
                     data=csv_data,
@@ -1241,17 +1310,10 @@ if uploaded_files:
                     help="Download complete attendance data with categories (weekday basis)"
                 )
             elif not df.empty:
-                # Create summary report from attendance data (weekdays)
-                weekday_df = df[df['is_weekday']].copy()
-                summary_df = weekday_df.groupby(['name', 'department']).agg({
-                    'sign_in_time': 'count',
-                    'on_time': 'sum',
-                    'late': 'sum'
-                }).reset_index()
-                summary_df.columns = ['name', 'department', 'total_days', 'on_time_days', 'late_days']
-                summary_df['on_time_percentage'] = round((summary_df['on_time_days'] / summary_df['total_days']) * 100, 1)
+                # Create summary report from the weekday stats already aggregated for the leaderboard
+                summary_df = attendance_stats[['name', 'department', 'total_days', 'on_time_days', 'late_days', 'on_time_percentage']]
                 
-                csv_data = summary_df.to_csv(index=False)
+                csv_data = convert_df_to_csv(summary_df)
                 st.download_button(
                     label="📊 Download Summary Report",
                     data=csv_data,
@@ -1262,7 +1324,7 @@ if uploaded_files:
         with col2:
             # Export leaderboard
             if not leaderboard.empty:
-                csv_data = leaderboard.to_csv(index=False)
+                csv_data = convert_df_to_csv(leaderboard)
                 st.download_button(
                     label="🏆 Download Leaderboard",
                     data=csv_data,
@@ -1273,7 +1335,7 @@ if uploaded_files:
         with col3:
             # Export non-attending staff list
             if not non_attending_staff.empty:
-                csv_data = non_attending_staff.to_csv(index=False)
+                csv_data = convert_df_to_csv(non_attending_staff)
                 st.download_button(
                     label="📋 Download Non-Attending List",
                     data=csv_data,